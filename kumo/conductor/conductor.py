@@ -1,68 +1,143 @@
 import abc
+import collections
 import os
 import json
+import logging
+import struct
 import subprocess
 import time
 import tarfile
+import threading
 import boto3
 import requests
 import math
-import datetime
+from urllib import parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import cached_property
+from functools import lru_cache
 from functools import wraps
 
+from boto3.s3.transfer import TransferConfig
+from botocore import config
+from botocore import waiter
+from botocore.exceptions import ClientError
+
 from azure.storage import blob
 from azure.mgmt import compute
 from azure.mgmt import network
 from azure.common.client_factory import get_client_from_json_dict
 
 from google.cloud import storage
+from google.cloud.storage import transfer_manager
 from google.cloud import exceptions
 from google.oauth2 import service_account
 
 from googleapiclient import discovery
+from googleapiclient import errors
 
 from celery import Celery
-from celery import task
 
-CELERY = Celery()
-CELERY.config_from_envvar("CELERY_BROKER_URL", "amqp://")
+LOG = logging.getLogger(__name__)
+
+CELERY = Celery(
+    "kumo",
+    broker=os.environ.get("CELERY_BROKER_URL", "amqp://"),
+    backend=os.environ.get("CELERY_RESULT_BACKEND"))
+CELERY.conf.task_acks_late = True
+CELERY.conf.worker_prefetch_multiplier = 1
+
+BOTO_SESSION = boto3.Session()
+BOTO_SESSION_LOCK = threading.Lock()
+
+BOTO_CONFIG = config.Config(
+    retries={"max_attempts": 10, "mode": "adaptive"},
+    max_pool_connections=50,
+    tcp_keepalive=True)
+
+VOLUME_PATH = "/home/ubuntu/volume"
+
+DOWNLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+DOWNLOAD_CONCURRENCY = 16
+UPLOAD_CONCURRENCY = 8
+UPLOAD_PAGE_SIZE = 4 * 1024 * 1024
+
+AZURE_POLLING_INTERVAL = 5
+
+CLOUD_BUILD_ROLES = (
+    "roles/compute.admin",
+    "roles/iam.serviceAccountUser",
+    "roles/iam.serviceAccountTokenCreator")
+
+TRANSFER_CHUNK_SIZE = 64 * 1024 * 1024
+TRANSFER_CONCURRENCY = 16
+
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=TRANSFER_CHUNK_SIZE,
+    multipart_chunksize=TRANSFER_CHUNK_SIZE,
+    max_concurrency=TRANSFER_CONCURRENCY,
+    use_threads=True)
+
+STREAM_CHUNK_SIZE = 16 * 1024 * 1024
+STREAM_CONCURRENCY = 8
+S3_MAX_PARTS = 10000
+
+
+def get_http_session(pool_size):
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size))
+    return session
 
 
 def audit(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        initial = datetime.datetime.now()
-        print("{}:{}:{}:started".format(
-            args[0].__class__.__name__, func.__name__, initial))
-        result = func(*args, **kwargs)
-        final = datetime.datetime.now()
-        print("{}:{}:{}:ended".format(
-            args[0].__class__.__name__, func.__name__, final))
-        total = final - initial
-        print("{}:{}:{}:total".format(
-            args[0].__class__.__name__, func.__name__, total.total_seconds()))
-        return result
+        if not LOG.isEnabledFor(logging.INFO):
+            return func(*args, **kwargs)
+        name = args[0].__class__.__name__
+        LOG.info("%s:%s:started", name, func.__name__)
+        initial = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            LOG.info("%s:%s:%.3f:total",
+                     name, func.__name__, time.perf_counter() - initial)
     return wrapper
 
 
-def get_assume_role_policy_document():
-    return json.dumps({
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Effect": "Allow",
-                "Principal": {"Service": "vmie.amazonaws.com"},
-                "Action": "sts:AssumeRole",
-                "Condition": {
-                    "StringEquals": {
-                        "sts:ExternalId": "vmimport"
-                    }
+@contextmanager
+def timed(label):
+    initial = time.monotonic()
+    try:
+        yield
+    finally:
+        LOG.debug("%s:%.3fs", label, time.monotonic() - initial)
+
+
+ASSUME_ROLE_POLICY_DOCUMENT = json.dumps({
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Effect": "Allow",
+            "Principal": {"Service": "vmie.amazonaws.com"},
+            "Action": "sts:AssumeRole",
+            "Condition": {
+                "StringEquals": {
+                    "sts:ExternalId": "vmimport"
                 }
             }
-        ]
-    })
+        }
+    ]
+}, separators=(",", ":"))
+
+
+def get_assume_role_policy_document():
+    return ASSUME_ROLE_POLICY_DOCUMENT
 
 
+@lru_cache(maxsize=32)
 def get_policy_document(bucket):
     return json.dumps({
         "Version": "2012-10-17",
@@ -90,13 +165,108 @@ def get_policy_document(bucket):
                 "Resource":"*"
             }
         ]
+    }, separators=(",", ":"))
+
+
+def get_import_image_waiter(client):
+    model = waiter.WaiterModel({
+        "version": 2,
+        "waiters": {
+            "ImportImageTaskCompleted": {
+                "operation": "DescribeImportImageTasks",
+                "delay": 15,
+                "maxAttempts": 2880,
+                "acceptors": [
+                    {
+                        "state": "success",
+                        "matcher": "pathAll",
+                        "argument": "ImportImageTasks[].Status",
+                        "expected": "completed"
+                    },
+                    {
+                        "state": "failure",
+                        "matcher": "pathAny",
+                        "argument": "ImportImageTasks[].Status",
+                        "expected": "deleting"
+                    },
+                    {
+                        "state": "failure",
+                        "matcher": "pathAny",
+                        "argument": "ImportImageTasks[].Status",
+                        "expected": "deleted"
+                    }
+                ]
+            }
+        }
     })
+    return waiter.create_waiter_with_client(
+        "ImportImageTaskCompleted", model, client)
 
 
 class KumoException(Exception):
     pass
 
 
+def get_error_code(error):
+    return error.response.get("Error", {}).get("Code")
+
+
+VHD_FOOTER_SIZE = 512
+
+
+def read_vhd_footer(path):
+    with open(path, "rb") as disk:
+        disk.seek(-VHD_FOOTER_SIZE, os.SEEK_END)
+        return disk.read(VHD_FOOTER_SIZE)
+
+
+def is_fixed_vhd(footer):
+    disk_type, = struct.unpack(">I", footer[60:64])
+    return footer[:8] == b"conectix" and disk_type == 2
+
+
+def get_vhd_geometry(size):
+    sectors = min(size // 512, 65535 * 16 * 255)
+    if sectors >= 65535 * 16 * 63:
+        sectors_per_track, heads = 255, 16
+    else:
+        sectors_per_track = 17
+        heads = max((sectors // sectors_per_track + 1023) // 1024, 4)
+        if sectors // sectors_per_track >= heads * 1024 or heads > 16:
+            sectors_per_track, heads = 31, 16
+        if sectors // sectors_per_track >= heads * 1024:
+            sectors_per_track, heads = 63, 16
+    cylinders = sectors // sectors_per_track // heads
+    return cylinders, heads, sectors_per_track
+
+
+def make_fixed_vhd_footer(footer, size):
+    footer = bytearray(footer)
+    struct.pack_into(">Q", footer, 16, 0xFFFFFFFFFFFFFFFF)
+    struct.pack_into(">QQ", footer, 40, size, size)
+    struct.pack_into(">HBB", footer, 56, *get_vhd_geometry(size))
+    struct.pack_into(">II", footer, 60, 2, 0)
+    struct.pack_into(">I", footer, 64, ~sum(footer) & 0xFFFFFFFF)
+    return bytes(footer)
+
+
+def wait_until(request, done, status=None, timeout=43200, delay=1.0, max_delay=60.0):
+    deadline = time.monotonic() + timeout
+    previous = None
+    while time.monotonic() < deadline:
+        response = request()
+        if status:
+            current = status(response)
+            if current and current != previous:
+                LOG.info("operation status: %s", current)
+                previous = current
+        if done(response):
+            return response
+        time.sleep(delay)
+        delay = min(delay * 1.5, max_delay)
+    raise KumoException("Timeout while waiting for operation.")
+
+
 class BaseDriver(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
@@ -123,6 +293,14 @@ class BaseDriver(metaclass=abc.ABCMeta):
     def upload_disk(self):
         pass
 
+    @abc.abstractmethod
+    def read_disk(self):
+        pass
+
+    @abc.abstractmethod
+    def write_disk(self, stream, size):
+        pass
+
     @abc.abstractmethod
     def import_disk(self):
         pass
@@ -136,6 +314,8 @@ class AmazonDriver(BaseDriver):
 
     def __init__(self, source_or_destination, migration):
         self.server_name = migration.get("virtual_machine")
+        self.blob_name = "{0}.{1}".format(self.server_name, "vhd")
+        self.disk_path = os.path.join(VOLUME_PATH, self.blob_name)
         migration = migration.get(source_or_destination)
         self.bucket_name = migration.get("bucket")
         self.server_capacity = migration.get("instance_type")
@@ -143,65 +323,82 @@ class AmazonDriver(BaseDriver):
         self.cloud_availability_zone = migration.get("availability_zone")
         self.aws_access_key_id = migration.get("aws_access_key_id")
         self.aws_secret_access_key = migration.get("aws_secret_access_key")
+        self.instance_id = None
+
+    def _create(self, factory, service_name):
+        with BOTO_SESSION_LOCK:
+            return factory(
+                service_name,
+                aws_access_key_id=self.aws_access_key_id,
+                aws_secret_access_key=self.aws_secret_access_key,
+                region_name=self.cloud_region,
+                config=BOTO_CONFIG)
+
+    @cached_property
+    def ec2(self):
+        return self._create(BOTO_SESSION.client, "ec2")
+
+    @cached_property
+    def s3(self):
+        return self._create(BOTO_SESSION.client, "s3")
+
+    @cached_property
+    def s3_resource(self):
+        return self._create(BOTO_SESSION.resource, "s3")
+
+    @cached_property
+    def iam(self):
+        return self._create(BOTO_SESSION.client, "iam")
+
+    def _resolve_instance_id(self):
+        if self.instance_id:
+            return self.instance_id
+
+        response = self.ec2.describe_instances(
+            Filters=[
+                {"Name": "tag:Name", "Values": [self.server_name]},
+                {"Name": "instance-state-name",
+                 "Values": ["pending", "running", "stopping", "stopped"]}])
+        for reservation in response.get("Reservations") or []:
+            for instance in reservation.get("Instances") or []:
+                self.instance_id = instance.get("InstanceId")
+                return self.instance_id
 
     @audit
     def start_server(self):
-        ec2 = boto3.client(
-            "ec2",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.cloud_region)
-
-        response = ec2.describe_instances(
-                Filters=[{"Name": "tag:Name", "Values": [self.server_name]}])
-        reservations = response.get("Reservations")
-        instances = reservations[0].get("Instances")
-        if instances:
-            instance = instances[0]
-            instance_id = instance.get("InstanceId")
-            response = ec2.start_instances(InstanceIds=[instance_id])
-            waiter = ec2.get_waiter("instance_running")
-            waiter.wait(
-                Filters=[{"Name": "instance-id", "Values": [instance_id]}],
-                WaiterConfig={"Delay": 1, "MaxAttempts": 600})
+        instance_id = self._resolve_instance_id()
+        if not instance_id:
+            return
+
+        self.ec2.start_instances(InstanceIds=[instance_id])
+        waiter = self.ec2.get_waiter("instance_running")
+        waiter.wait(
+            InstanceIds=[instance_id],
+            WaiterConfig={"Delay": 5, "MaxAttempts": 120})
 
     @audit
     def delete_image(self):
-        ec2 = boto3.client(
-            "ec2",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.cloud_region)
-        images = ec2.describe_images(
+        response = self.ec2.describe_images(
+            Owners=["self"],
             Filters=[{"Name": "name", "Values": [self.server_name]}])
-        image = images.get("Images")
-        if image:
-            image = images.get("Images")[0]
-            image_id = image.get("ImageId")
-            response = ec2.deregister_image(ImageId=image_id)
+        images = response.get("Images") or []
+        if images:
+            self.ec2.deregister_image(ImageId=images[0].get("ImageId"))
 
     @audit
     def delete_bucket(self):
-        iam = boto3.client(
-            "iam",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key)
-        resource = boto3.resource(
-            "s3",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key)
         try:
-            iam.delete_role_policy(PolicyName="vmimport", RoleName="vmimport")
+            self.iam.delete_role_policy(PolicyName="vmimport", RoleName="vmimport")
         except Exception:
             pass
 
         try:
-            iam.delete_role(RoleName="vmimport")
+            self.iam.delete_role(RoleName="vmimport")
         except Exception:
             pass
 
         try:
-            bucket = resource.Bucket(self.bucket_name)
+            bucket = self.s3_resource.Bucket(self.bucket_name)
             bucket.objects.all().delete()
             bucket.delete()
         except Exception:
@@ -209,55 +406,43 @@ class AmazonDriver(BaseDriver):
 
     @audit
     def delete_server(self):
-        ec2 = boto3.client(
-            "ec2",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.cloud_region)
-        response = ec2.describe_instances(
-                Filters=[
-                    {"Name": "instance-state-name", "Values": ["running"]},
-                    {"Name": "tag:Name", "Values": [self.server_name]}])
-        reservations = response.get("Reservations")
-        instances = reservations[0].get("Instances")
-        if instances:
-            instance = instances[0]
-            instance_id = instance.get("InstanceId")
-            ec2.terminate_instances(InstanceIds=[instance_id])
-            waiter = ec2.get_waiter("instance_terminated")
-            waiter.wait(
-                Filters=[{"Name": "instance-id", "Values": [instance_id]}],
-                WaiterConfig={"Delay": 1, "MaxAttempts": 600})
+        instance_id = self._resolve_instance_id()
+        if not instance_id:
+            return
+
+        self.ec2.terminate_instances(InstanceIds=[instance_id])
+        waiter = self.ec2.get_waiter("instance_terminated")
+        waiter.wait(
+            InstanceIds=[instance_id],
+            WaiterConfig={"Delay": 5, "MaxAttempts": 120})
+        self.instance_id = None
 
     @audit
     def create_bucket(self):
-        s3 = boto3.client(
-            "s3",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key)
-
         try:
-            s3.head_bucket(Bucket=self.bucket_name)
-        except Exception:
+            self.s3.head_bucket(Bucket=self.bucket_name)
+        except ClientError as error:
+            if get_error_code(error) not in ("404", "NoSuchBucket", "NotFound"):
+                raise
             try:
                 if(self.cloud_region == "us-east-1"):
-                    s3.create_bucket(Bucket=self.bucket_name)
+                    self.s3.create_bucket(Bucket=self.bucket_name)
                 else:
-                    s3.create_bucket(Bucket=self.bucket_name,
+                    self.s3.create_bucket(Bucket=self.bucket_name,
                         CreateBucketConfiguration={"LocationConstraint": self.cloud_region})
-                waiter = s3.get_waiter("bucket_exists")
+                waiter = self.s3.get_waiter("bucket_exists")
                 waiter.wait(
                     Bucket=self.bucket_name,
                     WaiterConfig={"Delay": 1, "MaxAttempts": 600})
             except Exception:
                 raise KumoException("Error while creating bucket on aws.")
 
-        bucket_acl = s3.get_bucket_acl(Bucket=self.bucket_name)
+        bucket_acl = self.s3.get_bucket_acl(Bucket=self.bucket_name)
         owner_id = bucket_acl.get("Owner").get("ID")
         grant_full_controll = "id={0}".format(owner_id)
 
         try:
-            response = s3.put_bucket_acl(
+            response = self.s3.put_bucket_acl(
                 Bucket=self.bucket_name,
                 GrantFullControl=grant_full_controll,
                 GrantWrite="emailaddress=vm-import-export@amazon.com",
@@ -265,28 +450,31 @@ class AmazonDriver(BaseDriver):
         except Exception:
             raise KumoException("Error while creating acl for bucket on aws s3.")
 
-        iam = boto3.client(
-            "iam",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key)
-
         try:
-            iam.get_role(RoleName="vmimport")
-        except Exception:
+            self.iam.get_role(RoleName="vmimport")
+        except ClientError as error:
+            if get_error_code(error) != "NoSuchEntity":
+                raise
             try:
-                iam.create_role(
+                self.iam.create_role(
                     AssumeRolePolicyDocument=get_assume_role_policy_document(),
                     RoleName="vmimport")
+            except ClientError as error:
+                # The other side of an account-local migration may have just created it.
+                if get_error_code(error) != "EntityAlreadyExists":
+                    raise KumoException("Error while creating vmimport role on aws iam.")
             except Exception:
                 raise KumoException("Error while creating vmimport role on aws iam.")
 
         try:
-            iam.get_role_policy(
+            self.iam.get_role_policy(
                 RoleName="vmimport",
                 PolicyName="vmimport")
-        except Exception:
+        except ClientError as error:
+            if get_error_code(error) != "NoSuchEntity":
+                raise
             try:
-                iam.put_role_policy(
+                self.iam.put_role_policy(
                     RoleName="vmimport",
                     PolicyName="vmimport",
                     PolicyDocument=get_policy_document(self.bucket_name))
@@ -295,47 +483,29 @@ class AmazonDriver(BaseDriver):
 
     @audit
     def stop_server(self):
-        ec2 = boto3.client(
-            "ec2",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.cloud_region)
-        response = ec2.describe_instances(
-                Filters=[{"Name": "tag:Name", "Values": [self.server_name]}])
-        reservations = response.get("Reservations")
-        instances = reservations[0].get("Instances")
-        if instances:
-            instance = instances[0]
-            instance_id = instance.get("InstanceId")
-            ec2.stop_instances(InstanceIds=[instance_id])
-            waiter = ec2.get_waiter("instance_stopped")
-            waiter.wait(
-                Filters=[{"Name": "instance-id", "Values": [instance_id]}],
-                WaiterConfig={"Delay": 1, "MaxAttempts": 600})
+        instance_id = self._resolve_instance_id()
+        if not instance_id:
+            return
+
+        self.ec2.stop_instances(InstanceIds=[instance_id])
+        waiter = self.ec2.get_waiter("instance_stopped")
+        waiter.wait(
+            InstanceIds=[instance_id],
+            WaiterConfig={"Delay": 5, "MaxAttempts": 120})
 
     @audit
     def export_disk(self):
-        ec2 = boto3.client(
-            "ec2",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.cloud_region)
-
         export_to_s3_task = {
             "DiskImageFormat": "VHD",
             "S3Bucket": self.bucket_name
         }
 
-        response = ec2.describe_instances(
-                Filters=[{"Name": "tag:Name", "Values": [self.server_name]}])
-        reservations = response.get("Reservations")
-        instances = reservations[0].get("Instances")
-        if instances:
-            instance = instances[0]
-            instance_id = instance.get("InstanceId")
+        instance_id = self._resolve_instance_id()
+        if not instance_id:
+            raise KumoException("Error while finding instance on aws ec2.")
 
         try:
-            response = ec2.create_instance_export_task(
+            response = self.ec2.create_instance_export_task(
                 ExportToS3Task=export_to_s3_task,
                 InstanceId=instance_id,
                 TargetEnvironment="microsoft")
@@ -345,34 +515,41 @@ class AmazonDriver(BaseDriver):
         export_task = response.get("ExportTask")
         export_task_id = export_task.get("ExportTaskId")
 
-        waiter = ec2.get_waiter("export_task_completed")
+        waiter = self.ec2.get_waiter("export_task_completed")
 
         waiter.wait(
             ExportTaskIds=[export_task_id],
-            WaiterConfig={"Delay": 1, "MaxAttempts": 43200})
+            WaiterConfig={"Delay": 15, "MaxAttempts": 2880})
 
         export_to_s3_task = export_task.get("ExportToS3Task")
         self.aws_s3_disk_name = export_to_s3_task.get("S3Key")
 
     @audit
     def download_disk(self):
-        s3 = boto3.client(
-            "s3",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key)
+        with open(self.disk_path, "wb") as data:
+            try:
+                self.s3.download_fileobj(
+                    Bucket=self.bucket_name,
+                    Key=self.aws_s3_disk_name,
+                    Fileobj=data,
+                    Config=S3_TRANSFER_CONFIG)
+            except Exception:
+                raise KumoException("Error while downloading file from aws s3.")
+            data.flush()
+            size = os.fstat(data.fileno()).st_size
 
-        key = "{0}{1}{2}".format(self.server_name, ".", "vhd")
+        LOG.info("disk size (bytes): %d", size)
 
+    @audit
+    def read_disk(self):
         try:
-            s3.download_file(
+            response = self.s3.get_object(
                 Bucket=self.bucket_name,
-                Key=self.aws_s3_disk_name,
-                Filename="/home/ubuntu/volume/{0}".format(key))
+                Key=self.aws_s3_disk_name)
         except Exception:
-            raise KumoException("Error while downloading file from aws s3.")
+            raise KumoException("Error while reading file from aws s3.")
 
-        disk = "/home/ubuntu/volume/{0}".format(key)
-        print("disk size (bytes): {}".format(os.path.getsize(disk)))
+        return response.get("Body"), response.get("ContentLength")
 
     @audit
     def prepare_disk(self):
@@ -380,76 +557,72 @@ class AmazonDriver(BaseDriver):
 
     @audit
     def upload_disk(self):
-        s3 = boto3.client(
-            "s3",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key)
-
-        blob_name = "{0}.{1}".format(self.server_name, "vhd")
-        path = os.path.join("/home/ubuntu/volume/{0}".format(blob_name))
+        size = os.path.getsize(self.disk_path)
+        self.s3.upload_file(
+            Filename=self.disk_path,
+            Bucket=self.bucket_name,
+            Key=self.blob_name,
+            Config=S3_TRANSFER_CONFIG)
+        LOG.info("disk size (bytes): %d", size)
+        os.remove(self.disk_path)
+        LOG.info("disk status: deleted")
 
-        with open(path, "rb") as data:
-            s3.upload_fileobj(data, self.bucket_name, blob_name)
-        disk = "/home/ubuntu/volume/{0}".format(blob_name)
-        print("disk size (bytes): {}".format(os.path.getsize(disk)))
-        os.remove(disk)
-        print("disk status: deleted")
+    @audit
+    def write_disk(self, stream, size):
+        # Parts of a stream are buffered in memory, so keep them small while
+        # staying within the S3 part limit.
+        chunk_size = max(STREAM_CHUNK_SIZE, -(-size // S3_MAX_PARTS))
+        self.s3.upload_fileobj(
+            Fileobj=stream,
+            Bucket=self.bucket_name,
+            Key=self.blob_name,
+            Config=TransferConfig(
+                multipart_threshold=chunk_size,
+                multipart_chunksize=chunk_size,
+                max_concurrency=STREAM_CONCURRENCY,
+                use_threads=True))
+        LOG.info("disk size (bytes): %d", size)
 
     @audit
     def import_disk(self):
-        ec2 = boto3.client(
-            "ec2",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.cloud_region)
-
         disk_containers = [{
             "Format": "VHD",
             "UserBucket": {
                 "S3Bucket": self.bucket_name,
-                "S3Key": "{0}.{1}".format(self.server_name, "vhd")
+                "S3Key": self.blob_name
             }
         }]
 
         try:
-            response = ec2.import_image(DiskContainers=disk_containers)
+            response = self.ec2.import_image(DiskContainers=disk_containers)
         except Exception:
             raise KumoException("Error while importing image to aws ec2.")
 
         import_task_id = response.get("ImportTaskId")
 
-        for second in range(43200):
-            time.sleep(1)
-            response = ec2.describe_import_image_tasks(ImportTaskIds=[import_task_id])
-            import_image_task = response.get("ImportImageTasks")[0]
-            status = import_image_task.get("Status")
-            status_message = import_image_task.get("StatusMessage")
-            if second % 60 == 0 and status_message:
-                print("task {} status: {}".format(import_task_id, status_message))
-            if status == "completed":
-                print("task {} status: completed".format(import_task_id))
-                break
+        waiter = get_import_image_waiter(self.ec2)
+        waiter.wait(
+            ImportTaskIds=[import_task_id],
+            WaiterConfig={"Delay": 15, "MaxAttempts": 2880})
+
+        response = self.ec2.describe_import_image_tasks(ImportTaskIds=[import_task_id])
+        import_image_task = response.get("ImportImageTasks")[0]
+        LOG.info("task %s status: completed", import_task_id)
 
         self.aws_ec2_image_id = import_image_task.get("ImageId")
 
-        waiter = ec2.get_waiter("image_available")
+        waiter = self.ec2.get_waiter("image_available")
         waiter.wait(
             Filters=[{"Name": "image-id", "Values": [self.aws_ec2_image_id]}],
-            WaiterConfig={"Delay": 1, "MaxAttempts": 6000})
+            WaiterConfig={"Delay": 15, "MaxAttempts": 400})
 
     @audit
     def create_server(self):
-        ec2 = boto3.client(
-            "ec2",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.cloud_region)
-
         tag_specifications = [
             {"ResourceType": "instance",
              "Tags": [{"Key": "Name", "Value": self.server_name}]}]
 
-        response = ec2.run_instances(
+        response = self.ec2.run_instances(
             MaxCount=1,
             MinCount=1,
             InstanceType=self.server_capacity,
@@ -458,17 +631,19 @@ class AmazonDriver(BaseDriver):
             Placement={"AvailabilityZone": self.cloud_availability_zone})
         instances = response.get("Instances")
         instance = instances[0]
-        instance_id = instance.get("InstanceId")
-        waiter = ec2.get_waiter("instance_running")
+        self.instance_id = instance.get("InstanceId")
+        waiter = self.ec2.get_waiter("instance_running")
         waiter.wait(
-            Filters=[{"Name": "instance-id", "Values": [instance_id]}],
-            WaiterConfig={"Delay": 1, "MaxAttempts": 6000})
+            InstanceIds=[self.instance_id],
+            WaiterConfig={"Delay": 5, "MaxAttempts": 1200})
 
 
 class GoogleDriver(BaseDriver):
 
     def __init__(self, source_or_destination, migration):
         self.server_name = migration.get("virtual_machine")
+        self.blob_name = "{0}.{1}".format(self.server_name, "vhd")
+        self.disk_path = os.path.join(VOLUME_PATH, self.blob_name)
         migration = migration.get(source_or_destination)
         self.bucket_name = migration.get("bucket")
         self.disk_system = migration.get("system")
@@ -486,51 +661,138 @@ class GoogleDriver(BaseDriver):
         self.credentials["client_x509_cert_url"] = migration.get("client_x509_cert_url")
         self.credentials["private_key"] = migration.get("private_key")
         self.project_id = self.credentials["project_id"]
-        self.client_email = self.credentials["client_email"]
+
+    @cached_property
+    def service_account_credentials(self):
+        return service_account.Credentials.from_service_account_info(self.credentials)
+
+    @cached_property
+    def gce(self):
+        return discovery.build(
+            "compute", "v1",
+            credentials=self.service_account_credentials,
+            cache_discovery=False,
+            static_discovery=True)
+
+    @cached_property
+    def cloudbuild(self):
+        return discovery.build(
+            "cloudbuild", "v1",
+            credentials=self.service_account_credentials,
+            cache_discovery=False,
+            static_discovery=True)
+
+    @cached_property
+    def resource_manager(self):
+        return discovery.build(
+            "cloudresourcemanager", "v1",
+            credentials=self.service_account_credentials,
+            cache_discovery=False,
+            static_discovery=True)
+
+    @cached_property
+    def gcs(self):
+        return storage.Client(
+            project=self.project_id,
+            credentials=self.service_account_credentials)
+
+    def _wait_for_operation(self, operations, operation, **kwargs):
+        response = wait_until(
+            lambda: operations.wait(
+                project=self.project_id,
+                operation=operation.get("name"),
+                **kwargs).execute(),
+            lambda response: response.get("status") == "DONE",
+            lambda response: response.get("status"),
+            # operations.wait already long-polls on the server, so do not back off.
+            max_delay=1.0)
+
+        if response.get("error"):
+            raise KumoException("Error while waiting for operation on gcp gce.")
+
+    def _grant_build_roles(self):
+        # The daisy builders run as the Cloud Build service account, which
+        # gcloud grants these roles before submitting them.
+        projects = self.resource_manager.projects()
+        try:
+            project = projects.get(projectId=self.project_id).execute()
+            member = "serviceAccount:{0}@cloudbuild.gserviceaccount.com".format(
+                project.get("projectNumber"))
+            policy = projects.getIamPolicy(
+                resource=self.project_id,
+                body={"options": {"requestedPolicyVersion": 3}}).execute()
+            bindings = policy.setdefault("bindings", [])
+            missing = False
+            for role in CLOUD_BUILD_ROLES:
+                binding = next(
+                    (binding for binding in bindings
+                     if binding.get("role") == role and not binding.get("condition")),
+                    None)
+                if binding is None:
+                    binding = {"role": role, "members": []}
+                    bindings.append(binding)
+                if member not in binding["members"]:
+                    binding["members"].append(member)
+                    missing = True
+            if missing:
+                projects.setIamPolicy(
+                    resource=self.project_id,
+                    body={"policy": policy}).execute()
+        except errors.HttpError:
+            raise KumoException(
+                "Error while granting {0} to the cloud build service account on gcp iam; "
+                "grant them or allow resourcemanager.projects.setIamPolicy.".format(
+                    ", ".join(CLOUD_BUILD_ROLES)))
+
+    def _run_build(self, builder, args):
+        self._grant_build_roles()
+        args = args + [
+            "-client_id=api",
+            "-zone={0}".format(self.cloud_zone),
+            "-timeout=42000s"]
+        body = {
+            "steps": [{"name": builder, "args": args}],
+            "timeout": "43200s",
+            "tags": ["gce-daisy"]
+        }
+
+        operation = self.cloudbuild.projects().builds().create(
+            projectId=self.project_id,
+            body=body).execute()
+
+        response = wait_until(
+            lambda: self.cloudbuild.operations().get(
+                name=operation.get("name")).execute(),
+            lambda response: response.get("done"),
+            lambda response: response.get("metadata", {}).get("build", {}).get("status"))
+
+        if response.get("error"):
+            raise KumoException("Error while running build on gcp cloud build.")
 
     @audit
     def delete_server(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gce = discovery.build("compute", "v1", credentials=credentials)
-        gce.instances().delete(
+        operation = self.gce.instances().delete(
             project=self.project_id,
             zone=self.cloud_zone,
             instance=self.server_name).execute()
 
-        for _ in range(43200):
-            time.sleep(1)
-            response = gce.instances().get(
-                project=self.project_id,
-                zone=self.cloud_zone,
-                instance=self.server_name).execute()
-            status = response.get("status")
-            if status == "TERMINATED":
-                break
+        self._wait_for_operation(
+            self.gce.zoneOperations(), operation, zone=self.cloud_zone)
+
     @audit
     def start_server(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gce = discovery.build("compute", "v1", credentials=credentials)
-        gce.instances().start(
+        operation = self.gce.instances().start(
             project=self.project_id,
             zone=self.cloud_zone,
             instance=self.server_name).execute()
 
-        for _ in range(43200):
-            time.sleep(1)
-            response = gce.instances().get(
-                project=self.project_id,
-                zone=self.cloud_zone,
-                instance=self.server_name).execute()
-            status = response.get("status")
-            if status == "RUNNING":
-                break
+        self._wait_for_operation(
+            self.gce.zoneOperations(), operation, zone=self.cloud_zone)
 
     @audit
     def delete_image(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gce = discovery.build("compute", "v1", credentials=credentials)
         try:
-            gce.images().delete(
+            self.gce.images().delete(
                 project=self.project_id,
                 image=self.server_name).execute()
         except Exception:
@@ -538,27 +800,23 @@ class GoogleDriver(BaseDriver):
 
     @audit
     def delete_bucket(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gcs = storage.Client(project=self.project_id, credentials=credentials)
         try:
-            bucket = gcs.get_bucket(bucket_or_name=self.bucket_name)
-            blobs = bucket.list_blobs()
-            for blob in blobs:
-                blob.delete()
+            bucket = self.gcs.get_bucket(bucket_or_name=self.bucket_name)
+            blobs = list(bucket.list_blobs())
+            for index in range(0, len(blobs), 100):
+                with self.gcs.batch():
+                    bucket.delete_blobs(blobs[index:index + 100])
             bucket.delete()
         except exceptions.NotFound:
             pass
 
     @audit
     def create_bucket(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gcs = storage.Client(project=self.project_id, credentials=credentials)
-
         try:
-            gcs.get_bucket(bucket_or_name=self.bucket_name)
+            self.gcs.get_bucket(bucket_or_name=self.bucket_name)
         except exceptions.NotFound:
 
-            bucket = gcs.bucket(self.bucket_name)
+            bucket = self.gcs.bucket(self.bucket_name)
             try:
                 bucket.create()
             except Exception:
@@ -566,30 +824,17 @@ class GoogleDriver(BaseDriver):
 
     @audit
     def stop_server(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gce = discovery.build("compute", "v1", credentials=credentials)
-
-        response = gce.instances().stop(
+        operation = self.gce.instances().stop(
             project=self.project_id,
             zone=self.cloud_zone,
             instance=self.server_name).execute()
 
-        for _ in range(600):
-            time.sleep(1)
-            response = gce.instances().get(
-                project=self.project_id,
-                zone=self.cloud_zone,
-                instance=self.server_name).execute()
-            status = response.get("status")
-            if status == "TERMINATED":
-                break
+        self._wait_for_operation(
+            self.gce.zoneOperations(), operation, zone=self.cloud_zone)
 
     @audit
     def export_disk(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gce = discovery.build("compute", "v1", credentials=credentials)
-
-        response = gce.instances().get(
+        response = self.gce.instances().get(
             project=self.project_id,
             zone=self.cloud_zone,
             instance=self.server_name).execute()
@@ -600,56 +845,41 @@ class GoogleDriver(BaseDriver):
 
         body = {"name": self.server_name, "sourceDisk": disk}
 
-        response = gce.images().insert(
+        operation = self.gce.images().insert(
             project=self.project_id,
             body=body).execute()
 
-        for _ in range(43200):
-            time.sleep(1)
-            response = gce.images().get(
-                project=self.project_id,
-                image=self.server_name).execute()
-            status = response.get("status")
-            if status == "READY":
-                break
-
-        home = "/home/ubuntu/volume"
-        home = os.path.join(home, "{0}{1}{2}".format(self.project_id, ".", "json"))
-
-        with open(home, "w") as credentials_file:
-            json.dump(self.credentials, credentials_file)
+        self._wait_for_operation(self.gce.globalOperations(), operation)
 
-        key_file = "--key-file={0}".format(home)
-        project = "--project={0}".format(self.project_id)
+        source_image = "projects/{0}/global/images/{1}".format(
+            self.project_id, self.server_name)
+        destination_uri = "gs://{0}/{1}".format(
+            self.bucket_name, self.blob_name)
 
-        result = subprocess.run(
-            ["gcloud", "auth", "activate-service-account",
-             self.client_email, key_file, project], stdout=subprocess.PIPE)
-
-        image = "--image={0}".format(self.server_name)
-        destination_uri = "--destination-uri=gs://{0}/{1}.{2}".format(
-            self.bucket_name, self.server_name, "vhd")
-
-        command = ["gcloud", "compute", "images", "export",
-                   image, destination_uri]
-
-        export_format = "--export-format={0}".format("vpc")
-        command.append(export_format)
-
-        result = subprocess.run(command, stdout=subprocess.PIPE)
+        self._run_build(
+            "gcr.io/compute-image-tools/gce_vm_image_export:release",
+            ["-source_image={0}".format(source_image),
+             "-destination_uri={0}".format(destination_uri),
+             "-format=vpc"])
 
     @audit
     def download_disk(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gcs = storage.Client(project=self.project_id, credentials=credentials)
-        bucket = gcs.get_bucket(bucket_or_name=self.bucket_name)
-        blob_name = "{0}.{1}".format(self.server_name, "vhd")
-        blob = bucket.blob(blob_name=blob_name)
-        path = "/home/ubuntu/volume"
-        path = os.path.join(path, "{0}".format(blob_name))
-        blob.download_to_filename(path)
-        disk = "/home/ubuntu/volume/{0}".format(blob_name)
-        print("disk size (bytes): {}".format(os.path.getsize(disk)))
+        bucket = self.gcs.get_bucket(bucket_or_name=self.bucket_name)
+        blob = bucket.blob(blob_name=self.blob_name)
+        transfer_manager.download_chunks_concurrently(
+            blob, self.disk_path,
+            chunk_size=TRANSFER_CHUNK_SIZE,
+            max_workers=TRANSFER_CONCURRENCY,
+            worker_type=transfer_manager.THREAD)
+        LOG.info("disk size (bytes): %d", blob.size)
+
+    @audit
+    def read_disk(self):
+        bucket = self.gcs.get_bucket(bucket_or_name=self.bucket_name)
+        blob = bucket.get_blob(blob_name=self.blob_name)
+        if blob is None:
+            raise KumoException("Error while reading file from gcp gcs.")
+        return blob.open("rb", chunk_size=TRANSFER_CHUNK_SIZE), blob.size
 
     @audit
     def prepare_disk(self):
@@ -657,49 +887,42 @@ class GoogleDriver(BaseDriver):
 
     @audit
     def upload_disk(self):
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gcs = storage.Client(project=self.project_id, credentials=credentials)
-
         try:
-            bucket = gcs.get_bucket(bucket_or_name=self.bucket_name)
+            bucket = self.gcs.get_bucket(bucket_or_name=self.bucket_name)
         except TypeError:
             raise KumoException("Error while get bucket on gcp gcs.")
 
-        blob_name = "{0}{1}{2}".format(self.server_name, ".", "vhd")
-        blob = bucket.blob(blob_name=blob_name)
-        filename = "/home/ubuntu/volume/{0}".format(blob_name)
+        blob = bucket.blob(blob_name=self.blob_name)
+        size = os.path.getsize(self.disk_path)
         try:
-            blob.upload_from_filename(filename=filename)
+            transfer_manager.upload_chunks_concurrently(
+                self.disk_path, blob,
+                chunk_size=TRANSFER_CHUNK_SIZE,
+                max_workers=TRANSFER_CONCURRENCY,
+                worker_type=transfer_manager.THREAD)
         except TypeError:
             raise KumoException("Error while create bucket on gcp gcs.")
 
-        disk = "/home/ubuntu/volume/{0}".format(blob_name)
-        print("disk size (bytes): {}".format(os.path.getsize(disk)))
-        os.remove(disk)
-        print("disk status: deleted")
+        LOG.info("disk size (bytes): %d", size)
+        os.remove(self.disk_path)
+        LOG.info("disk status: deleted")
 
     @audit
-    def import_disk(self):
-        home = "/home/ubuntu/volume"
-        home = os.path.join(home, "{0}{1}{2}".format(self.project_id, ".", "json"))
-
-        with open(home, "w") as credentials_file:
-            json.dump(self.credentials, credentials_file)
-
-        key_file = "--key-file={0}".format(home)
-        project = "--project={0}".format(self.project_id)
+    def write_disk(self, stream, size):
+        bucket = self.gcs.get_bucket(bucket_or_name=self.bucket_name)
+        blob = bucket.blob(blob_name=self.blob_name, chunk_size=TRANSFER_CHUNK_SIZE)
+        blob.upload_from_file(stream, size=size, rewind=False)
+        LOG.info("disk size (bytes): %d", size)
 
-        result = subprocess.run(
-            ["gcloud", "auth", "activate-service-account",
-             self.client_email, key_file, project], stdout=subprocess.PIPE)
+    @audit
+    def import_disk(self):
+        source_file = "gs://{0}/{1}".format(self.bucket_name, self.blob_name)
 
-        key = "{0}{1}{2}".format(self.server_name, ".", "vhd")
-        source_file = "--source-file=gs://{0}/{1}".format(self.bucket_name, key)
-        operating_system = "--os={0}".format(self.disk_system)
-        quiet = "--quiet"
-        result = subprocess.run(
-            ["gcloud", "compute", "images", "import",
-             self.server_name, source_file, operating_system, quiet], stdout=subprocess.PIPE)
+        self._run_build(
+            "gcr.io/compute-image-tools/gce_vm_image_import:release",
+            ["-image_name={0}".format(self.server_name),
+             "-source_file={0}".format(source_file),
+             "-os={0}".format(self.disk_system)])
 
     @audit
     def create_server(self):
@@ -730,29 +953,22 @@ class GoogleDriver(BaseDriver):
             ]
         }
 
-        credentials = service_account.Credentials.from_service_account_info(self.credentials)
-        gce = discovery.build("compute", "v1", credentials=credentials)
-
-        gce.instances().insert(
+        operation = self.gce.instances().insert(
             project=self.project_id,
             zone=self.cloud_zone,
             body=body).execute()
 
-        for _ in range(43200):
-            time.sleep(1)
-            response = gce.instances().get(
-                project=self.project_id,
-                zone=self.cloud_zone,
-                instance=self.server_name).execute()
-            status = response.get("status")
-            if status == "RUNNING":
-                break
+        self._wait_for_operation(
+            self.gce.zoneOperations(), operation, zone=self.cloud_zone)
 
 
 class MicrosoftDriver(BaseDriver):
 
     def __init__(self, source_or_destination, migration):
         self.server_name = migration.get("virtual_machine")
+        self.blob_name = "{0}.{1}".format(self.server_name, "vhd")
+        self.disk_path = os.path.join(VOLUME_PATH, self.blob_name)
+        self.raw_path = os.path.join(VOLUME_PATH, "{0}.{1}".format(self.server_name, "raw"))
         migration = migration.get(source_or_destination)
         self.bucket_name = migration.get("container")
         self.server_capacity = migration.get("virtual_machine_size")
@@ -784,66 +1000,68 @@ class MicrosoftDriver(BaseDriver):
         self.credentials_compute["sqlManagementEndpointUrl"] = sql_management_endpoint_url
         self.credentials_compute["galleryEndpointUrl"] = gallery_endpoint_url
         self.credentials_compute["managementEndpointUrl"] = management_endpoint_url
+        self.disk_size_gb = None
+        self.async_nic_creation = None
+
+    @cached_property
+    def compute_client(self):
+        client = get_client_from_json_dict(
+            client_class=compute.ComputeManagementClient,
+            config_dict=self.credentials_compute)
+        client.config.long_running_operation_timeout = AZURE_POLLING_INTERVAL
+        return client
+
+    @cached_property
+    def network_client(self):
+        client = get_client_from_json_dict(
+            client_class=network.NetworkManagementClient,
+            config_dict=self.credentials_compute)
+        client.config.long_running_operation_timeout = AZURE_POLLING_INTERVAL
+        return client
+
+    @cached_property
+    def page_blob_service(self):
+        return blob.PageBlobService(
+            account_name=self.account_name,
+            account_key=self.account_key,
+            request_session=get_http_session(DOWNLOAD_CONCURRENCY))
 
     @audit
     def start_server(self):
-        client_class = compute.ComputeManagementClient
-        compute_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-        virtual_machine = compute_client.virtual_machines.start(
+        virtual_machine = self.compute_client.virtual_machines.start(
             resource_group_name=self.cloud_resource_group_name,
             vm_name=self.server_name)
         virtual_machine.wait()
 
     @audit
     def delete_bucket(self):
-        page_blob_service = blob.PageBlobService(
-            account_name=self.account_name,
-            account_key=self.account_key)
-        page_blob_service.delete_container(self.bucket_name)
+        self.page_blob_service.delete_container(self.bucket_name)
 
     @audit
     def delete_server(self):
-        client_class = compute.ComputeManagementClient
-        compute_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-        virtual_machine = compute_client.virtual_machines.delete(
+        virtual_machine = self.compute_client.virtual_machines.delete(
             resource_group_name=self.cloud_resource_group_name,
             vm_name=self.server_name)
         virtual_machine.wait()
 
     @audit
     def delete_image(self):
-        client_class = compute.ComputeManagementClient
-        compute_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-        snapshot = compute_client.snapshots.revoke_access(
+        snapshot = self.compute_client.snapshots.revoke_access(
             resource_group_name=self.cloud_resource_group_name,
             snapshot_name=self.server_name)
         snapshot.wait()
-        snapshot = compute_client.snapshots.delete(
+        snapshot = self.compute_client.snapshots.delete(
             resource_group_name=self.cloud_resource_group_name,
             snapshot_name=self.server_name)
         snapshot.wait()
 
     @audit
     def create_bucket(self):
-        page_blob_service = blob.PageBlobService(
-            account_name=self.account_name,
-            account_key=self.account_key)
-        page_blob_service.create_container(self.bucket_name)
+        self.page_blob_service.create_container(self.bucket_name)
 
     @audit
     def stop_server(self):
-        client_class = compute.ComputeManagementClient
-        compute_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-
-        virtual_machine = compute_client.virtual_machines.power_off(
+        virtual_machine = self.compute_client.virtual_machines.power_off(
             resource_group_name=self.cloud_resource_group_name,
             vm_name=self.server_name)
 
@@ -851,12 +1069,7 @@ class MicrosoftDriver(BaseDriver):
 
     @audit
     def export_disk(self):
-        client_class = compute.ComputeManagementClient
-        compute_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-
-        virtual_machine = compute_client.virtual_machines.get(
+        virtual_machine = self.compute_client.virtual_machines.get(
             resource_group_name=self.cloud_resource_group_name,
             vm_name=self.server_name)
 
@@ -865,8 +1078,9 @@ class MicrosoftDriver(BaseDriver):
         managed_disk = operating_system_disk.managed_disk
         source_uri = managed_disk.id
         disk_size_gb = operating_system_disk.disk_size_gb
+        self.disk_size_gb = disk_size_gb
 
-        async_snapshot_creation = compute_client.snapshots.create_or_update(
+        async_snapshot_creation = self.compute_client.snapshots.create_or_update(
             resource_group_name=self.cloud_resource_group_name,
             snapshot_name=self.server_name,
             snapshot={
@@ -881,127 +1095,191 @@ class MicrosoftDriver(BaseDriver):
 
         async_snapshot_creation.wait()
 
-    @audit
-    def download_disk(self):
-        client_class = compute.ComputeManagementClient
-        compute_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-
-        snapshot = compute_client.snapshots.grant_access(
+    def _grant_access(self):
+        snapshot = self.compute_client.snapshots.grant_access(
             resource_group_name=self.cloud_resource_group_name,
             snapshot_name=self.server_name,
             access="read",
             duration_in_seconds=18000)
         snapshot.wait()
-        access_sas = snapshot.result().access_sas
+        return snapshot.result().access_sas
 
-        blob_name = "{0}.{1}".format(self.server_name, "vhd")
-        path = "/home/ubuntu/volume"
-        path = os.path.join(path, "{0}".format(blob_name))
-        response = requests.get(access_sas, stream=True)
+    def _open_snapshot(self):
+        url = parse.urlsplit(self._grant_access())
+        container_name, blob_name = url.path.lstrip("/").split("/", 1)
 
-        handle = open(path, "wb")
-        for chunk in response.iter_content(chunk_size=512):
-            if chunk:
-                handle.write(chunk)
+        page_blob_service = blob.PageBlobService(
+            account_name=url.netloc.split(".")[0],
+            sas_token=url.query,
+            custom_domain="https://{0}".format(url.netloc),
+            request_session=get_http_session(DOWNLOAD_CONCURRENCY))
+        page_blob_service.MAX_CHUNK_GET_SIZE = DOWNLOAD_CHUNK_SIZE
+        return page_blob_service, container_name, blob_name
 
-        disk = "/home/ubuntu/volume/{0}".format(blob_name)
-        print("disk size (bytes): {}".format(os.path.getsize(disk)))
+    @audit
+    def download_disk(self):
+        page_blob_service, container_name, blob_name = self._open_snapshot()
+
+        descriptor = os.open(self.disk_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        if self.disk_size_gb:
+            # Reserve the whole disk up front so it lands in few extents.
+            os.posix_fallocate(descriptor, 0, (self.disk_size_gb << 30) + VHD_FOOTER_SIZE)
+        with os.fdopen(descriptor, "wb") as handle:
+            snapshot = page_blob_service.get_blob_to_stream(
+                container_name=container_name,
+                blob_name=blob_name,
+                stream=handle,
+                max_connections=DOWNLOAD_CONCURRENCY)
+            handle.truncate(snapshot.properties.content_length)
+
+        LOG.debug("disk size (bytes): %d", snapshot.properties.content_length)
+
+    @audit
+    def read_disk(self):
+        access_sas = self._grant_access()
+        response = requests.get(access_sas, stream=True)
+        response.raise_for_status()
+        return response.raw, int(response.headers.get("Content-Length"))
 
     @audit
     def prepare_disk(self):
-        blob_name = "{0}.{1}".format(self.server_name, "vhd")
-        file_path = "/home/ubuntu/volume/{0}".format(blob_name)
-
-        temp_name = "{0}.{1}".format(self.server_name, "raw")
-        temp_file_path = "/home/ubuntu/volume/{0}".format(temp_name)
-
-        initial = datetime.datetime.now()
-        print("convertion from VHD to RAW: started")
-        result = subprocess.run(
-            ["qemu-img", "convert", "-f", "vpc", "-O", "raw",
-             file_path, temp_file_path],
-             stdout=subprocess.PIPE)
-        final = datetime.datetime.now()
-        total = final - initial
-        print("{}:{}:{}:total".format("MicrosoftDriver", "from vhd to raw", total.total_seconds()))
-
-        initial = datetime.datetime.now()
-        print("determining new VHD size: started")
-        command = ["qemu-img", "info", temp_file_path, "--output", "json"]
-        result = subprocess.run(command, stdout=subprocess.PIPE)
-
-        result = result.stdout
-        info = json.loads(result)
-        virtual_size = info.get("virtual-size")
+        footer = read_vhd_footer(self.disk_path)
+        virtual_size = os.path.getsize(self.disk_path) - VHD_FOOTER_SIZE
+        if is_fixed_vhd(footer) and virtual_size % (1024 * 1024) == 0:
+            LOG.debug("disk already aligned: skipped")
+            return
+
+        with timed("vhd->raw"):
+            if is_fixed_vhd(footer):
+                # A fixed VHD is the raw disk followed by its footer.
+                os.rename(self.disk_path, self.raw_path)
+                os.truncate(self.raw_path, virtual_size)
+            else:
+                subprocess.run(
+                    ["qemu-img", "convert", "-m", "8", "-W", "-S", "4k",
+                     "-t", "none", "-T", "none",
+                     "-f", "vpc", "-O", "raw", self.disk_path, self.raw_path],
+                     stdout=subprocess.PIPE, check=True)
+                os.remove(self.disk_path)
+                virtual_size = os.path.getsize(self.raw_path)
+
         megabyte = 1024 * 1024
-        rounded_size = virtual_size + (megabyte - virtual_size % megabyte)
-        rounded_size = str(rounded_size)
-
-        print("virtual_size (byte)")
-        print(virtual_size)
-        print("rounded_size (byte)")
-        print(rounded_size)
-
-        final = datetime.datetime.now()
-        total = final - initial
-        print("{}:{}:{}:total".format("MicrosoftDriver", "calculate new size", total.total_seconds()))
-
-        initial = datetime.datetime.now()
-        print("start resize disk: started")
-        command = ["qemu-img", "resize", "-f", "raw", temp_file_path, rounded_size]
-        result = subprocess.run(command, stdout=subprocess.PIPE)
-        final = datetime.datetime.now()
-        total = final - initial
-        print("{}:{}:{}:total".format("MicrosoftDriver", "resize disk", total.total_seconds()))
-
-        initial = datetime.datetime.now()
-        print("convertion from RAW to VHD: started")
-        command = ["qemu-img", "convert", "-f", "raw",
-                   "-o", "subformat=fixed,force_size",
-                   "-O", "vpc", temp_file_path, file_path]
-
-        result = subprocess.run(command, stdout=subprocess.PIPE)
-        final = datetime.datetime.now()
-        total = final - initial
-        print("{}:{}:{}:total".format("MicrosoftDriver", "from raw to vhd", total.total_seconds()))
+        rounded_size = (virtual_size + megabyte - 1) & ~(megabyte - 1)
+        LOG.debug("virtual size: %d, rounded size: %d", virtual_size, rounded_size)
+
+        with timed("resize"):
+            # Growing the raw file is sparse, so no data is written.
+            os.truncate(self.raw_path, rounded_size)
+
+        with timed("raw->vhd"):
+            # Appending a fixed VHD footer turns the raw disk back into a VHD.
+            with open(self.raw_path, "ab") as disk:
+                disk.write(make_fixed_vhd_footer(footer, rounded_size))
+            os.rename(self.raw_path, self.disk_path)
+
+    def _upload_page(self, descriptor, offset, length):
+        self._write_page(offset, os.pread(descriptor, length, offset))
+
+    def _write_page(self, offset, page):
+        # Page blobs are sparse, so zeroed pages need not be sent.
+        if page.count(0) == len(page):
+            return
+        self.page_blob_service.update_page(
+            container_name=self.bucket_name,
+            blob_name=self.blob_name,
+            page=page,
+            start_range=offset,
+            end_range=offset + len(page) - 1)
 
     @audit
     def upload_disk(self):
+        descriptor = os.open(self.disk_path, os.O_RDONLY)
+        # The open descriptor keeps the data until the upload is done.
+        os.remove(self.disk_path)
+        try:
+            size = os.fstat(descriptor).st_size
+            self.page_blob_service.create_blob(
+                container_name=self.bucket_name,
+                blob_name=self.blob_name,
+                content_length=size)
+            with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+                pages = [
+                    executor.submit(self._upload_page, descriptor, offset,
+                                    min(UPLOAD_PAGE_SIZE, size - offset))
+                    for offset in range(0, size, UPLOAD_PAGE_SIZE)]
+            for page in pages:
+                page.result()
+        finally:
+            os.close(descriptor)
+        LOG.info("disk size (bytes): %d", size)
+
+    def _copy_page(self, snapshot_service, container_name, blob_name, offset, length):
+        page = snapshot_service.get_blob_to_bytes(
+            container_name=container_name,
+            blob_name=blob_name,
+            start_range=offset,
+            end_range=offset + length - 1,
+            max_connections=1).content
+        self._write_page(offset, page)
 
-        blob_name = "{0}.{1}".format(self.server_name, "vhd")
-        file_path = "/home/ubuntu/volume/{0}".format(blob_name)
+    @audit
+    def copy_disk(self, source):
+        snapshot_service, container_name, blob_name = source._open_snapshot()
+        size = snapshot_service.get_blob_properties(
+            container_name=container_name,
+            blob_name=blob_name).properties.content_length
+        self.page_blob_service.create_blob(
+            container_name=self.bucket_name,
+            blob_name=self.blob_name,
+            content_length=size)
 
-        page_blob_service = blob.PageBlobService(
-            account_name=self.account_name,
-            account_key=self.account_key)
+        # Only pages holding allocated ranges are fetched; the rest read as zero.
+        page_ranges = snapshot_service.get_page_ranges(
+            container_name=container_name,
+            blob_name=blob_name)
+        offsets = sorted({
+            offset
+            for page_range in page_ranges
+            for offset in range(
+                page_range.start - page_range.start % UPLOAD_PAGE_SIZE,
+                page_range.end + 1,
+                UPLOAD_PAGE_SIZE)})
+
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as executor:
+            pages = [
+                executor.submit(self._copy_page, snapshot_service, container_name,
+                                blob_name, offset, min(UPLOAD_PAGE_SIZE, size - offset))
+                for offset in offsets]
+        for page in pages:
+            page.result()
+        LOG.info("disk size (bytes): %d", size)
 
-        page_blob_service.create_blob_from_path(
+    @audit
+    def write_disk(self, stream, size):
+        self.page_blob_service.create_blob(
             container_name=self.bucket_name,
-            blob_name=blob_name,
-            file_path=file_path)
-
-        disk = "/home/ubuntu/volume/{0}".format(blob_name)
-        print("disk size (bytes): {}".format(os.path.getsize(disk)))
-        os.remove(disk)
-        print("disk status: deleted")
+            blob_name=self.blob_name,
+            content_length=size)
+        with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+            pages = collections.deque()
+            for offset in range(0, size, UPLOAD_PAGE_SIZE):
+                # Bound the pages held in memory while the stream outpaces the upload.
+                if len(pages) == 2 * UPLOAD_CONCURRENCY:
+                    pages.popleft().result()
+                length = min(UPLOAD_PAGE_SIZE, size - offset)
+                page = stream.read(length)
+                if len(page) != length:
+                    raise KumoException("Error while reading disk stream for azure blob.")
+                pages.append(executor.submit(self._write_page, offset, page))
+            for page in pages:
+                page.result()
+        LOG.info("disk size (bytes): %d", size)
 
     @audit
     def import_disk(self):
-        client_class = compute.ComputeManagementClient
-        compute_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-
-        page_blob_service = blob.PageBlobService(
-            account_name=self.account_name,
-            account_key=self.account_key)
-
-        blob_name = "{0}.{1}".format(self.server_name, "vhd")
-        blob_uri = page_blob_service.make_blob_url(
+        blob_uri = self.page_blob_service.make_blob_url(
             container_name=self.bucket_name,
-            blob_name=blob_name)
+            blob_name=self.blob_name)
 
         image = {
             "location": self.cloud_location,
@@ -1015,27 +1293,23 @@ class MicrosoftDriver(BaseDriver):
             }
         }
 
-        async_image_creation = compute_client.images.create_or_update(
+        async_image_creation = self.compute_client.images.create_or_update(
             resource_group_name=self.cloud_resource_group_name,
             image_name=self.server_name,
             parameters=image)
+        # The network interface does not depend on the image, so create it meanwhile.
+        self.async_nic_creation = self._create_network_interface()
         async_image_creation.wait()
 
-    @audit
-    def create_server(self):
-        client_class = network.NetworkManagementClient
-        network_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-
-        subnet = network_client.subnets.get(
+    def _create_network_interface(self):
+        subnet = self.network_client.subnets.get(
             resource_group_name=self.cloud_resource_group_name,
             virtual_network_name=self.network_name,
             subnet_name=self.subnet_name)
 
         network_interface_name = "{}{}".format(self.server_name, "-interface")
         ip_name = "{}{}".format(self.server_name, "-ip")
-        async_nic_creation = network_client.network_interfaces.create_or_update(
+        return self.network_client.network_interfaces.create_or_update(
             resource_group_name=self.cloud_resource_group_name,
             network_interface_name=network_interface_name,
             parameters={
@@ -1048,6 +1322,10 @@ class MicrosoftDriver(BaseDriver):
                 }]
             }
         )
+
+    @audit
+    def create_server(self):
+        async_nic_creation = self.async_nic_creation or self._create_network_interface()
         async_nic_creation.wait()
 
         result = async_nic_creation.result()
@@ -1087,12 +1365,7 @@ class MicrosoftDriver(BaseDriver):
         if(self.cloud_location != "westus"):
             parameters["zones"] = [self.cloud_zones]
 
-        client_class = compute.ComputeManagementClient
-        compute_client = get_client_from_json_dict(
-            client_class=client_class,
-            config_dict=self.credentials_compute)
-
-        async_vm_creation = compute_client.virtual_machines.create_or_update(
+        async_vm_creation = self.compute_client.virtual_machines.create_or_update(
             resource_group_name=self.cloud_resource_group_name,
             vm_name=self.server_name,
             parameters=parameters)
@@ -1122,8 +1395,26 @@ class KumoConductor:
         if (account_name == "microsoft"):
             return MicrosoftDriver(source_or_destination, self.migration)
 
+    def transfer_disk(self):
+        if isinstance(self.source, MicrosoftDriver) and isinstance(self.destination, MicrosoftDriver):
+            # Azure snapshots are fixed VHDs of whole gigabytes, so they need no preparation.
+            self.destination.copy_disk(self.source)
+            return
+
+        # Azure snapshots download over parallel ranged reads, and Azure
+        # destinations need the disk prepared, so both are staged locally.
+        if isinstance(self.source, MicrosoftDriver) or isinstance(self.destination, MicrosoftDriver):
+            self.source.download_disk()
+            self.destination.prepare_disk()
+            self.destination.upload_disk()
+            return
+
+        stream, size = self.source.read_disk()
+        with stream:
+            self.destination.write_disk(stream, size)
+
 
-@task
+@CELERY.task
 def migrate(migration):
 
     with KumoConductor(migration) as conductor:
@@ -1133,12 +1424,13 @@ def migrate(migration):
         # conductor.source.delete_bucket()
         # conductor.source.delete_image()
         # conductor.source.start_server()
-        conductor.source.create_bucket()
-        conductor.destination.create_bucket()
-        conductor.source.stop_server()
-        conductor.source.export_disk()
-        conductor.source.download_disk()
-        conductor.destination.prepare_disk()
-        conductor.destination.upload_disk()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            destination_bucket = executor.submit(conductor.destination.create_bucket)
+            source_server = executor.submit(conductor.source.stop_server)
+            conductor.source.create_bucket()
+            source_server.result()
+            conductor.source.export_disk()
+            destination_bucket.result()
+        conductor.transfer_disk()
         conductor.destination.import_disk()
         conductor.destination.create_server()